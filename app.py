@@ -1,6 +1,9 @@
+import hmac
 import os
-from flask import Flask, request, render_template
+from flask import Flask, request, render_template, jsonify
 from worldly_agent import WorldlySustainabilityAgent
+from worldly_ingest import DEFAULT_CHUNK_SIZE, IngestError, ingest_stream, infer_format
+from worldly_prewarm import PrewarmScheduler
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -8,9 +11,13 @@ load_dotenv()
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
 if not WEATHER_API_KEY:
     raise ValueError("Missing WEATHER_API_KEY in environment variables.")
+# Bulk ingestion is disabled unless a token is configured
+INGEST_TOKEN = os.getenv("INGEST_TOKEN")
 
 app = Flask(__name__)
 agent = WorldlySustainabilityAgent(db_path="/tmp/worldly_risk.db")
+prewarmer = PrewarmScheduler(agent)
+prewarmer.start()
 
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -19,6 +26,7 @@ def index():
         if not question or question.strip().lower() == "exit":
             return render_template("index.html", error="Please enter a valid question.")
         
+        prewarmer.record(question)
         response = agent.run(question)
         
         if "error" in response:
@@ -35,6 +43,30 @@ def index():
     
     return render_template("index.html")
 
+@app.route("/ingest/<table>", methods=["POST"])
+def ingest(table):
+    auth = request.headers.get("Authorization", "")
+    if not INGEST_TOKEN or not hmac.compare_digest(auth, f"Bearer {INGEST_TOKEN}"):
+        return jsonify({"error": "Unauthorized."}), 401
+
+    # Multipart uploads are spooled to disk by Werkzeug; raw bodies are read straight off the socket
+    upload = request.files.get("file")
+    stream = upload.stream if upload else request.stream
+    fmt = request.args.get("format") or infer_format((upload.filename or "") if upload else "", request.mimetype)
+    chunk_size = request.args.get("chunk_size", DEFAULT_CHUNK_SIZE, type=int)
+    try:
+        report = ingest_stream(agent.engine, table, stream, fmt, chunk_size)
+    except IngestError as e:
+        # Chunks committed before the failure are kept; report them alongside the error
+        if e.report["rows_written"]:
+            prewarmer.trigger()
+        return jsonify({"error": str(e), **e.report}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if report["rows_written"]:
+        prewarmer.trigger()
+    return jsonify(report)
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(debug=False, host="0.0.0.0", port=port)
\ No newline at end of file
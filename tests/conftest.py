@@ -0,0 +1,6 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# worldly_agent refuses to import without a key; tests never call the weather API
+os.environ.setdefault("WEATHER_API_KEY", "test")
@@ -0,0 +1,117 @@
+import io
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from worldly_agent import initialize_sustainability_db
+from worldly_ingest import IngestError, ingest_stream, validate_record
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db_path = tmp_path / "worldly.db"
+    initialize_sustainability_db(str(db_path))
+    return create_engine(f"sqlite:///{db_path}")
+
+
+def data_version(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def test_validate_record_converts_types():
+    row = validate_record("supplier_history", {
+        "supplier_id": "3", "year": "2024", "carbon_footprint": "900.5", "water_usage": "12000", "compliance_score": "0.9"
+    })
+    assert row == {"supplier_id": 3, "year": "2024", "carbon_footprint": 900.5, "water_usage": 12000.0, "compliance_score": 0.9}
+
+
+@pytest.mark.parametrize("record", [
+    None,
+    {"name": "No Id"},
+    {"id": "abc", "name": "Bad Id"},
+    {"id": "9", "name": "Bad Score", "compliance_score": "1.5"}
+])
+def test_validate_record_rejects_bad_suppliers(record):
+    with pytest.raises((ValueError, TypeError)):
+        validate_record("suppliers", record)
+
+
+@pytest.mark.parametrize("year", ["20x4", "2024.5", "3024"])
+def test_validate_record_rejects_bad_years(year):
+    with pytest.raises(ValueError):
+        validate_record("supplier_history", {
+            "supplier_id": "1", "year": year, "carbon_footprint": "1", "water_usage": "1", "compliance_score": "0.5"
+        })
+
+
+def test_validate_record_requires_history_metrics():
+    with pytest.raises(ValueError, match="water_usage"):
+        validate_record("supplier_history", {"supplier_id": "1", "year": "2024", "carbon_footprint": "1", "compliance_score": "0.5"})
+
+
+def test_ingest_upserts_and_bumps_version(engine):
+    before = data_version(engine)
+    feed = b"id,name,location,carbon_footprint\n1,Shahjalal Textile Mills,,999\n100,New Supplier,\"Hanoi, Vietnam\",700\n"
+    report = ingest_stream(engine, "suppliers", io.BytesIO(feed))
+
+    assert report["rows_written"] == 2
+    assert report["rows_rejected"] == 0
+    assert report["data_version"] == before + 1 == data_version(engine)
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text("SELECT id, carbon_footprint FROM suppliers WHERE id IN (1, 100)")).fetchall())
+        location = conn.execute(text("SELECT location FROM suppliers WHERE id = 1")).scalar()
+    assert rows == {1: 999.0, 100: 700.0}
+    # Columns a feed leaves empty keep their stored values
+    assert location == "Dhaka, Bangladesh"
+
+
+def test_ingest_reports_rejected_records(engine):
+    feed = b'{"id": 200, "name": "Good"}\nnot json\n{"name": "No Id"}\n'
+    report = ingest_stream(engine, "suppliers", io.BytesIO(feed), fmt="ndjson")
+
+    assert report["rows_written"] == 1
+    assert report["rows_rejected"] == 2
+    assert [error.split(":")[0] for error in report["errors"]] == ["record 2", "record 3"]
+
+
+def test_ingest_strips_byte_order_mark(engine):
+    report = ingest_stream(engine, "suppliers", io.BytesIO("﻿id,name\n300,BOM Supplier\n".encode("utf-8")))
+    assert report["rows_written"] == 1
+    assert report["rows_rejected"] == 0
+
+
+def test_partial_failure_keeps_committed_chunks(engine):
+    before = data_version(engine)
+    good = "".join(f"{i},Supplier {i}\n" for i in range(1000, 6000)).encode()
+    # Invalid UTF-8 well past the decoder's first buffer fails the stream mid-load
+    feed = b"id,name\n" + good + b"6000,Bad \xff\xfe\n"
+    with pytest.raises(IngestError) as excinfo:
+        ingest_stream(engine, "suppliers", io.BytesIO(feed), chunk_size=500)
+
+    report = excinfo.value.report
+    assert 0 < report["rows_written"] < 5000
+    assert report["rows_written"] == report["chunks"] * 500
+    assert report["data_version"] == before + 1 == data_version(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM suppliers WHERE id >= 1000")).scalar() == report["rows_written"]
+
+
+@pytest.mark.parametrize("chunk_size", [0, -1])
+def test_ingest_rejects_non_positive_chunk_size(engine, chunk_size):
+    with pytest.raises(ValueError):
+        ingest_stream(engine, "suppliers", io.BytesIO(b"id,name\n1,A\n"), chunk_size=chunk_size)
+
+
+class ReadOnlyStream:
+    # Like SpooledTemporaryFile before Python 3.11: read() but no readable()
+    def __init__(self, data):
+        self._buffer = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._buffer.read(size)
+
+
+def test_ingest_accepts_streams_with_only_read(engine):
+    report = ingest_stream(engine, "suppliers", ReadOnlyStream(b'id,name\n400,"Multi\nLine"\n'))
+    assert report["rows_written"] == 1
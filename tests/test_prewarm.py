@@ -0,0 +1,72 @@
+import threading
+import time
+
+from sqlalchemy import text
+
+from worldly_agent import WorldlySustainabilityAgent
+from worldly_prewarm import POPULAR_QUESTIONS, PrewarmScheduler
+
+
+class StubAgent:
+    def __init__(self, seconds=0.0, busy=False):
+        self.seconds = seconds
+        self.busy = busy
+        self.questions = []
+
+    def run(self, question, refresh=False, should_stop=None):
+        self.questions.append(question)
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline:
+            if not self.busy:
+                time.sleep(0.005)
+        if should_stop is not None and should_stop():
+            return {"error": "Pre-warm budget exhausted"}
+        return {"question": question}
+
+
+def test_warms_every_top_question_within_budget():
+    agent = StubAgent()
+    report = PrewarmScheduler(agent).warm()
+    assert report["warmed"] == len(agent.questions) == len(POPULAR_QUESTIONS)
+
+
+def test_stops_when_time_budget_is_exhausted():
+    agent = StubAgent(seconds=0.05)
+    report = PrewarmScheduler(agent, time_budget=0.12, cpu_budget=60).warm()
+    assert 0 < len(agent.questions) < len(POPULAR_QUESTIONS)
+    # The answer that crossed the budget is abandoned, not counted as warmed
+    assert report["warmed"] == len(agent.questions) - 1
+
+
+def test_stops_when_cpu_budget_is_exhausted():
+    agent = StubAgent(seconds=0.05, busy=True)
+    report = PrewarmScheduler(agent, time_budget=60, cpu_budget=0.12).warm()
+    assert 0 < len(agent.questions) < len(POPULAR_QUESTIONS)
+    assert report["cpu_seconds"] > 0.12
+
+
+def test_top_questions_follow_recorded_traffic():
+    scheduler = PrewarmScheduler(StubAgent(), top_k=2)
+    for _ in range(3):
+        scheduler.record("  Which products use ORGANIC cotton? ")
+    scheduler.record("Which products use organic cotton?")
+    assert scheduler.top_questions()[0] == "which products use organic cotton?"
+    assert len(scheduler.top_questions()) == 2
+
+
+def test_other_threads_do_not_change_a_requests_data_version(tmp_path):
+    agent = WorldlySustainabilityAgent(db_path=str(tmp_path / "worldly.db"))
+    started = agent.refresh_data_version()
+    registry = agent.registry
+    with agent.engine.begin() as conn:
+        conn.execute(text(f"PRAGMA user_version = {started + 1}"))
+
+    # As the pre-warm thread does at the top of each poll
+    warmer = threading.Thread(target=agent.refresh_data_version)
+    warmer.start()
+    warmer.join()
+
+    assert agent.data_version == started
+    assert agent.registry is registry
+    assert agent.refresh_data_version() == started + 1
+    assert agent.registry.version == started + 1
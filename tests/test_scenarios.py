@@ -0,0 +1,57 @@
+import numpy as np
+
+import worldly_scenarios
+from worldly_scenarios import simulate_portfolio
+
+
+def risk_score(carbon, water, compliance):
+    # Module-level so the process pool can pickle it
+    return np.minimum(carbon / 1500, 1.0) * 0.4 + np.minimum(water / 20000, 1.0) * 0.3 + (1 - compliance) * 0.3
+
+
+def make_history(supplier_id, years=("2021", "2022", "2023", "2024")):
+    base = 800.0 + 50 * supplier_id
+    return {
+        "supplier_id": supplier_id,
+        "name": f"Supplier {supplier_id}",
+        "year": list(years),
+        "carbon_footprint": [base + 20 * i for i in range(len(years))],
+        "water_usage": [12000.0 + 300 * i for i in range(len(years))],
+        "compliance_score": [0.8 + 0.02 * i for i in range(len(years))]
+    }
+
+
+def test_results_do_not_depend_on_sharding(monkeypatch):
+    histories = [make_history(i) for i in range(1, 9)]
+    inline = simulate_portfolio(histories, risk_score, horizon=3, n_paths=200, workers=1)
+    monkeypatch.setattr(worldly_scenarios, "SUPPLIERS_PER_SHARD", 1)
+    sharded = simulate_portfolio(histories, risk_score, horizon=3, n_paths=200, workers=3)
+
+    assert worldly_scenarios._pool is not None
+    assert sorted(sharded) == sorted(inline) == [f"Supplier {i}" for i in range(1, 9)]
+    assert sharded == inline
+
+
+def test_results_do_not_depend_on_portfolio_order():
+    histories = [make_history(i) for i in range(1, 5)]
+    forward = simulate_portfolio(histories, risk_score, horizon=3, n_paths=200, workers=1)
+    backward = simulate_portfolio(histories[::-1], risk_score, horizon=3, n_paths=200, workers=1)
+    assert forward == backward
+
+
+def test_bands_are_ordered_and_projected_past_history():
+    scenario = simulate_portfolio([make_history(1)], risk_score, horizon=3, n_paths=500, workers=1)["Supplier 1"]
+    assert scenario["years"] == ["2025", "2026", "2027"]
+    for bands in scenario["bands"].values():
+        assert np.all(np.diff([bands[p] for p in ("p5", "p25", "p50", "p75", "p95")], axis=0) >= 0)
+    assert all(0.0 <= v <= 1.0 for v in scenario["bands"]["compliance_score"]["p95"])
+
+
+def test_bad_histories_are_skipped():
+    missing_metric = make_history(2)
+    missing_metric["water_usage"][1] = None
+    bad_year = make_history(3, years=("2021", "20x2"))
+    empty = make_history(4, years=())
+
+    results = simulate_portfolio([make_history(1), missing_metric, bad_year, empty], risk_score, n_paths=50, workers=1)
+    assert list(results) == ["Supplier 1"]
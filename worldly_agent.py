@@ -1,15 +1,23 @@
+import glob
+import hashlib
 import os
 import sqlite3
-from typing import List, Dict, Any
+import tempfile
+import threading
+import time
+from typing import Callable, List, Dict, Any
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
 import json
 import plotly.express as px
-from datetime import datetime
+import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 import requests
 from fuzzywuzzy import fuzz
+from worldly_registry import SupplierRegistry
+from worldly_scenarios import simulate_portfolio, simulate_supplier
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +25,39 @@ WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
 if not WEATHER_API_KEY:
     raise ValueError("Missing WEATHER_API_KEY in environment variables.")
 
+WORLDLY_COLORS = {
+    "high_risk": "#D32F2F",
+    "moderate_risk": "#FF9800",
+    "low_risk": "#4CAF50",
+    "below_threshold": "#D32F2F",
+    "above_threshold": "#4CAF50"
+}
+
+RISK_LABEL_COLORS = {
+    "High": WORLDLY_COLORS["high_risk"],
+    "Moderate": WORLDLY_COLORS["moderate_risk"],
+    "Low": WORLDLY_COLORS["low_risk"],
+    "Unknown": "#9E9E9E"
+}
+
+# Large-result rendering: above LARGE_RESULT_ROWS every chart switches to its bounded form
+LARGE_RESULT_ROWS = 200
+TOP_N_BARS = 25
+MAX_TREND_POINTS = 200
+MAX_ANNOTATIONS = 10
+GEO_BINS_PER_AXIS = 20  # grid sized to the data extent, so at most 400 cells
+OTHER_COLOR = "#9E9E9E"
+
+MAX_CACHED_RESPONSES = 256
+CHART_MAX_AGE = 2 * 3600  # seconds; comfortably longer than the 3600s response TTL
+
+class BudgetExceeded(Exception):
+    pass
+
+def normalize_question(question: str) -> str:
+    # Every step lowercases the question, so case and spacing never change the answer
+    return " ".join(question.lower().split())
+
 # Step 1: Initialize Database with Expanded Real-World Data
 def initialize_sustainability_db(db_path: str = "/tmp/worldly_risk.db") -> None:
     # Ensure the directory exists
@@ -24,12 +65,9 @@ def initialize_sustainability_db(db_path: str = "/tmp/worldly_risk.db") -> None:
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
-    cursor.execute("DROP TABLE IF EXISTS suppliers;")
-    cursor.execute("DROP TABLE IF EXISTS products;")
-    cursor.execute("DROP TABLE IF EXISTS supplier_history;")
-
+    # Non-destructive: keep anything loaded through worldly_ingest across restarts and workers
     cursor.execute('''
-        CREATE TABLE suppliers (
+        CREATE TABLE IF NOT EXISTS suppliers (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             location TEXT,
@@ -42,7 +80,7 @@ def initialize_sustainability_db(db_path: str = "/tmp/worldly_risk.db") -> None:
     ''')
 
     cursor.execute('''
-        CREATE TABLE products (
+        CREATE TABLE IF NOT EXISTS products (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             supplier_id INTEGER,
@@ -55,7 +93,7 @@ def initialize_sustainability_db(db_path: str = "/tmp/worldly_risk.db") -> None:
     ''')
 
     cursor.execute('''
-        CREATE TABLE supplier_history (
+        CREATE TABLE IF NOT EXISTS supplier_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             supplier_id INTEGER,
             year TEXT,
@@ -66,6 +104,9 @@ def initialize_sustainability_db(db_path: str = "/tmp/worldly_risk.db") -> None:
         )
     ''')
 
+    # Natural key for upserts from worldly_ingest
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_supplier_history_supplier_year ON supplier_history (supplier_id, year);")
+
     # Expanded real-world supplier data
     suppliers_data = [
         ("Shahjalal Textile Mills", "Dhaka, Bangladesh", 23.8103, 90.4125, 1450.0, 18000.0, 0.82),
@@ -102,9 +143,21 @@ def initialize_sustainability_db(db_path: str = "/tmp/worldly_risk.db") -> None:
         (8, "2021", 1150.0, 14500.0, 0.87), (8, "2022", 1100.0, 14000.0, 0.88), (8, "2023", 1075.0, 13500.0, 0.89), (8, "2024", 1050.0, 13250.0, 0.90),
     ]
 
-    cursor.executemany("INSERT INTO suppliers (name, location, latitude, longitude, carbon_footprint, water_usage, compliance_score) VALUES (?, ?, ?, ?, ?, ?, ?)", suppliers_data)
-    cursor.executemany("INSERT INTO products (name, supplier_id, production_date, carbon_per_unit, water_per_unit, material) VALUES (?, ?, ?, ?, ?, ?)", products_data)
-    cursor.executemany("INSERT INTO supplier_history (supplier_id, year, carbon_footprint, water_usage, compliance_score) VALUES (?, ?, ?, ?, ?)", supplier_history_data)
+    # Seed only empty tables
+    seeded = False
+    if cursor.execute("SELECT COUNT(*) FROM suppliers").fetchone()[0] == 0:
+        cursor.executemany("INSERT INTO suppliers (name, location, latitude, longitude, carbon_footprint, water_usage, compliance_score) VALUES (?, ?, ?, ?, ?, ?, ?)", suppliers_data)
+        seeded = True
+    if cursor.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 0:
+        cursor.executemany("INSERT INTO products (name, supplier_id, production_date, carbon_per_unit, water_per_unit, material) VALUES (?, ?, ?, ?, ?, ?)", products_data)
+        seeded = True
+    if cursor.execute("SELECT COUNT(*) FROM supplier_history").fetchone()[0] == 0:
+        cursor.executemany("INSERT INTO supplier_history (supplier_id, year, carbon_footprint, water_usage, compliance_score) VALUES (?, ?, ?, ?, ?)", supplier_history_data)
+        seeded = True
+    if seeded:
+        # Same data version bump as worldly_ingest, so other processes rebuild their caches
+        version = cursor.execute("PRAGMA user_version").fetchone()[0] + 1
+        cursor.execute(f"PRAGMA user_version = {int(version)}")
     conn.commit()
     conn.close()
 
@@ -112,10 +165,18 @@ def initialize_sustainability_db(db_path: str = "/tmp/worldly_risk.db") -> None:
 class WorldlySustainabilityAgent:
     def __init__(self, db_path: str = "/tmp/worldly_risk.db"):
         self.engine = create_engine(f"sqlite:///{db_path}")
-        # Initialize database on startup
+        # Create and seed the database on first startup
         initialize_sustainability_db(db_path)
+        # Request threads and the pre-warm thread share one agent: caches are guarded by
+        # _lock, and each thread keeps the data version its current request started with
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._registry = None
+        self._scenario_cache = {}
+        self._response_cache = {}
+        self._data_version = None
+        self.refresh_data_version()
         self.schema = self._get_full_schema()
-        self.supplier_names = self._get_supplier_names()
 
     def _get_full_schema(self) -> str:
         with self.engine.connect() as conn:
@@ -130,10 +191,43 @@ class WorldlySustainabilityAgent:
                 schema += "\n"
             return schema
 
-    def _get_supplier_names(self) -> List[str]:
+    def refresh_data_version(self) -> int:
+        # Bumped by worldly_ingest after every load, so other processes see new data too.
+        # Read once per request in run(); everything downstream in that thread uses this value.
         with self.engine.connect() as conn:
-            result = conn.execute(text("SELECT name FROM suppliers")).fetchall()
-            return [row[0] for row in result]
+            data_version = conn.execute(text("PRAGMA user_version")).scalar()
+        self._local.data_version = data_version
+        self._data_version = data_version
+        return data_version
+
+    @property
+    def data_version(self) -> int:
+        # Threads that have not started a request yet fall back to the latest version seen
+        return getattr(self._local, "data_version", self._data_version)
+
+    @property
+    def registry(self) -> SupplierRegistry:
+        # Rebuilt only when the underlying data version changes
+        data_version = self.data_version
+        registry = getattr(self._local, "registry", None)
+        if registry is not None and registry.version == data_version:
+            return registry
+        with self._lock:
+            registry = self._registry
+            if registry is None or registry.version != data_version:
+                with self.engine.connect() as conn:
+                    rows = conn.execute(text("SELECT id, name, location, latitude, longitude, carbon_footprint, water_usage FROM suppliers ORDER BY id")).fetchall()
+                registry = SupplierRegistry(rows, data_version)
+                # A request still on older data must not replace a newer shared registry
+                if self._registry is None or self._registry.version < data_version:
+                    self._registry = registry
+        # Kept per thread so a request on older data reuses its registry (and weather) between steps
+        self._local.registry = registry
+        return registry
+
+    @property
+    def supplier_names(self) -> List[str]:
+        return self.registry.names
 
     def _fetch_weather_data(self, lat: float, lon: float) -> Dict[str, Any]:
         url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={WEATHER_API_KEY}&units=metric"
@@ -149,30 +243,21 @@ class WorldlySustainabilityAgent:
         except requests.RequestException as e:
             return {"error": f"Weather API failed: {str(e)}"}
 
-    def _fetch_sustainability_data(self) -> Dict[str, Any]:
-        return {
-            "Shahjalal Textile Mills": {"emissions_risk": "High", "water_risk": "High"},
-            "Marzotto Group": {"emissions_risk": "Moderate", "water_risk": "Low"},
-            "Patagonia Suppliers": {"emissions_risk": "Low", "water_risk": "Low"},
-            "Arvind Limited": {"emissions_risk": "High", "water_risk": "Moderate"},
-            "Crystal Group": {"emissions_risk": "Moderate", "water_risk": "Moderate"},
-            "Esquel Group": {"emissions_risk": "Low", "water_risk": "Low"},
-            "Nishat Mills": {"emissions_risk": "High", "water_risk": "High"},
-            "Vardhman Textiles": {"emissions_risk": "Moderate", "water_risk": "Moderate"}
-        }
-
-    def _fetch_external_data(self) -> Dict[str, Any]:
-        with self.engine.connect() as conn:
-            suppliers = conn.execute(text("SELECT name, latitude, longitude FROM suppliers")).fetchall()
-        external_data = {"weather": {}, "sustainability": self._fetch_sustainability_data()}
-        for supplier in suppliers:
-            name, lat, lon = supplier
-            external_data["weather"][name] = self._fetch_weather_data(lat, lon)
-        return external_data
-
-    def _calculate_risk_score(self, carbon: float, water: float, compliance: float) -> float:
-        norm_carbon = min(carbon / 2000, 1.0)
-        norm_water = min(water / 25000, 1.0)
+    def _fetch_external_data(self, should_stop: Callable[[], bool] | None = None) -> SupplierRegistry:
+        registry = self.registry
+        registry.refresh_weather(self._fetch_weather_data, should_stop)
+        return registry
+
+    def _check_budget(self, should_stop: Callable[[], bool] | None) -> None:
+        # Lets background callers (pre-warming) abandon a question between expensive steps
+        if should_stop is not None and should_stop():
+            raise BudgetExceeded("Budget exhausted before the answer was complete.")
+
+    @staticmethod
+    def _calculate_risk_score(carbon: float, water: float, compliance: float) -> float:
+        # np.minimum so the same score can be applied to whole arrays of simulated paths
+        norm_carbon = np.minimum(carbon / 2000, 1.0)
+        norm_water = np.minimum(water / 25000, 1.0)
         norm_compliance = 1 - compliance
         return (0.4 * norm_carbon + 0.3 * norm_water + 0.3 * norm_compliance) * 100
 
@@ -183,6 +268,66 @@ class WorldlySustainabilityAgent:
             columns = ["year", "carbon_footprint", "water_usage", "compliance_score"]
             return [dict(zip(columns, row)) for row in result]
 
+    def _fetch_supplier_histories(self, supplier_id: int | None = None) -> List[Dict[str, Any]]:
+        with self.engine.connect() as conn:
+            where = "WHERE s.id = :sid " if supplier_id is not None else ""
+            query = text(f"SELECT s.id, s.name, sh.year, sh.carbon_footprint, sh.water_usage, sh.compliance_score FROM supplier_history sh JOIN suppliers s ON sh.supplier_id = s.id {where}ORDER BY s.id, sh.year")
+            result = conn.execute(query, {"sid": supplier_id}).fetchall()
+        histories = {}
+        for supplier_id, name, year, carbon, water, compliance in result:
+            history = histories.setdefault(supplier_id, {
+                "supplier_id": supplier_id, "name": name, "year": [],
+                "carbon_footprint": [], "water_usage": [], "compliance_score": []
+            })
+            history["year"].append(year)
+            history["carbon_footprint"].append(carbon)
+            history["water_usage"].append(water)
+            history["compliance_score"].append(compliance)
+        return list(histories.values())
+
+    def _store_scenario(self, key: tuple, scenario: Any) -> Any:
+        with self._lock:
+            # Drop scenarios simulated against older data
+            if any(k[0] < key[0] for k in self._scenario_cache):
+                self._scenario_cache = {k: v for k, v in self._scenario_cache.items() if k[0] >= key[0]}
+            self._scenario_cache[key] = scenario
+        return scenario
+
+    def simulate_supplier_scenario(self, supplier_name: str, horizon: int = 5, n_paths: int = 1000, seed: int = 42) -> Dict[str, Any] | None:
+        # Request path: simulate just this supplier inline, reusing a batch portfolio run if one is cached
+        data_version = self.data_version
+        key = (data_version, horizon, n_paths, seed, supplier_name)
+        with self._lock:
+            portfolio = self._scenario_cache.get(key[:4])
+            if portfolio is not None:
+                return portfolio.get(supplier_name)
+            if key in self._scenario_cache:
+                return self._scenario_cache[key]
+        # Simulated outside the lock; two threads may race to store the same deterministic result
+        record = self.registry.get(supplier_name)
+        histories = [h for h in self._fetch_supplier_histories(record.id) if h["year"]] if record else []
+        try:
+            scenario = simulate_supplier(histories[0], self._calculate_risk_score, horizon, n_paths, seed) if histories else None
+        except (ValueError, TypeError):
+            # Malformed history: answer without a scenario band rather than failing the request
+            scenario = None
+        return self._store_scenario(key, scenario)
+
+    def simulate_scenarios(self, horizon: int = 5, n_paths: int = 1000, seed: int = 42, workers: int | None = None) -> Dict[str, Dict[str, Any]]:
+        # Batch use only: large portfolios are sharded across the shared process pool
+        key = (self.data_version, horizon, n_paths, seed)
+        with self._lock:
+            if key in self._scenario_cache:
+                return self._scenario_cache[key]
+        return self._store_scenario(key, simulate_portfolio(
+            self._fetch_supplier_histories(),
+            self._calculate_risk_score,
+            horizon=horizon,
+            n_paths=n_paths,
+            seed=seed,
+            workers=workers
+        ))
+
     def _predict_future(self, trends: List[Dict[str, Any]], metric: str) -> float:
         if len(trends) < 2:
             return trends[-1][metric] if trends else 0.0
@@ -201,12 +346,23 @@ class WorldlySustainabilityAgent:
         return ((end - start) / start) * 100 if start != 0 else 0.0
 
     def _cache_result(self, key: str, value: Dict[str, Any], ttl: int = 3600) -> None:
-        # Removed Redis dependency - use a simple in-memory cache for now
-        pass
+        # In-memory cache (no Redis); oldest entries are evicted first once full
+        with self._lock:
+            self._response_cache.pop(key, None)
+            while len(self._response_cache) >= MAX_CACHED_RESPONSES:
+                self._response_cache.pop(next(iter(self._response_cache)), None)
+            self._response_cache[key] = (time.monotonic() + ttl, value)
 
     def _get_cached_result(self, key: str) -> Dict[str, Any] | None:
-        # Removed Redis dependency - return None for now
-        return None
+        with self._lock:
+            entry = self._response_cache.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._response_cache.pop(key, None)
+                return None
+            return value
 
     def _validate_sql(self, query: str) -> bool:
         try:
@@ -313,11 +469,11 @@ class WorldlySustainabilityAgent:
 
     def execute_query(self, query: str) -> List[Dict[str, Any]]:
         with self.engine.connect() as conn:
-            result = conn.execute(text(query)).fetchall()
-            columns = conn.execute(text(query)).keys()
-            return [dict(zip(columns, row)) for row in result]
+            result = conn.execute(text(query))
+            columns = tuple(result.keys())
+            return [dict(zip(columns, row)) for row in result.fetchall()]
 
-    def generate_insight(self, question: str, results: List[Dict[str, Any]], external_data: Dict[str, Any]) -> str:
+    def generate_insight(self, question: str, results: List[Dict[str, Any]], external_data: SupplierRegistry) -> str:
         question = question.lower()
         location = "India" if "india" in question else "China" if "china" in question else "USA" if "usa" in question else "Bangladesh" if "bangladesh" in question else "Pakistan" if "pakistan" in question else "Italy" if "italy" in question else "unknown"
         
@@ -333,7 +489,7 @@ class WorldlySustainabilityAgent:
             product = results[0]["name"]
             supplier = results[0]["supplier"]
             material = "cotton" if "cotton" in question else "wool" if "wool" in question else "polyester" if "polyester" in question else "denim" if "denim" in question else "unknown"
-            weather = external_data["weather"][supplier]["condition"] if supplier in external_data["weather"] else "unknown"
+            weather = external_data.weather_condition(supplier) or "unknown"
             if "high water usage" in question:
                 water_usage = results[0]["water_per_unit"]
                 industry_avg = 15.0
@@ -366,14 +522,21 @@ class WorldlySustainabilityAgent:
             trend = "decreasing" if trends[-1][metric] < trends[0][metric] else "increasing"
             trend_pct = self._calculate_trend_percentage(trends, metric)
             future = self._predict_future(trends, metric)
-            return f"{supplier_name}’s {metric_name} is {trend} from {trends[0][metric]} in 2021 to {trends[-1][metric]} in 2024 ({trend_pct:.1f}% change). If trends continue, it may be {future:.1f} {unit} by 2025—Worldly can leverage this trend to meet client ESG goals."
+            insight = f"{supplier_name}’s {metric_name} is {trend} from {trends[0][metric]} in 2021 to {trends[-1][metric]} in 2024 ({trend_pct:.1f}% change). If trends continue, it may be {future:.1f} {unit} by 2025—Worldly can leverage this trend to meet client ESG goals."
+            scenario = self.simulate_supplier_scenario(supplier_name)
+            if scenario:
+                band = scenario["bands"][metric]
+                risk_band = scenario["bands"]["risk_score"]
+                insight += f" Across {scenario['n_paths']} simulated scenarios, it lands between {band['p5'][-1]:.1f} and {band['p95'][-1]:.1f} {unit} by {scenario['years'][-1]} (90% band), with a median risk score of {risk_band['p50'][-1]:.1f}."
+            return insight
 
         if "suppliers in" in question or "suppliers are in" in question or "suppliers located in" in question:
             supplier = results[0]["name"]
             if "highest carbon footprint" in question:
-                with self.engine.connect() as conn:
-                    supplier_id = conn.execute(text("SELECT id FROM suppliers WHERE name = :name"), {"name": supplier}).fetchone()[0]
-                    trends = self._fetch_historical_trends(supplier_id)
+                record = self.registry.get(supplier)
+                trends = self._fetch_historical_trends(record.id) if record else []
+                if not trends:
+                    return f"{supplier} has the highest carbon footprint at {results[0]['carbon_footprint']} tons CO2e, but has no history yet to project a trend—Worldly can start tracking it with the Higg Index."
                 current_value = trends[-1]["carbon_footprint"]
                 trend = "decreasing" if trends[-1]["carbon_footprint"] < trends[0]["carbon_footprint"] else "increasing"
                 future = self._predict_future(trends, "carbon_footprint")
@@ -395,9 +558,10 @@ class WorldlySustainabilityAgent:
 
         if "highest carbon footprint" in question:
             top_supplier = results[0]["name"]
-            with self.engine.connect() as conn:
-                supplier_id = conn.execute(text("SELECT id FROM suppliers WHERE name = :name"), {"name": top_supplier}).fetchone()[0]
-                trends = self._fetch_historical_trends(supplier_id)
+            record = self.registry.get(top_supplier)
+            trends = self._fetch_historical_trends(record.id) if record else []
+            if not trends:
+                return f"{top_supplier} has the highest carbon footprint at {results[0]['carbon_footprint']} tons CO2e, but has no history yet to project a trend—Worldly can start tracking it with the Higg Index."
             current_value = trends[-1]["carbon_footprint"]
             trend = "decreasing" if trends[-1]["carbon_footprint"] < trends[0]["carbon_footprint"] else "increasing"
             future = self._predict_future(trends, "carbon_footprint")
@@ -415,7 +579,7 @@ class WorldlySustainabilityAgent:
             return f"{low_supplier} has the lowest compliance score at {results[0]['compliance_score']}—Worldly should prioritize an audit to improve ESG performance."
         elif "water-intensive" in question:
             supplier = results[0]["supplier"]
-            weather = external_data["weather"][supplier]["condition"]
+            weather = external_data.weather_condition(supplier)
             return f"Worldly can flag water-intensive products from {supplier}, potentially delayed by {weather} conditions—consider sourcing from Patagonia Suppliers with lower risk."
         elif "compliance" in question:
             product = results[0]["name"]
@@ -427,41 +591,86 @@ class WorldlySustainabilityAgent:
             return f"{top_supplier} has the highest risk score of {risk_score:.1f}—Worldly should prioritize them for sustainability interventions."
         return "No specific insight generated."
 
+    def _aggregate_top_n(self, df: pd.DataFrame, label: str, value: str, ascending: bool = False) -> pd.DataFrame:
+        if len(df) <= LARGE_RESULT_ROWS:
+            return df
+        ordered = df.sort_values(value, ascending=ascending)
+        top, rest = ordered.iloc[:TOP_N_BARS], ordered.iloc[TOP_N_BARS:]
+        other = {col: rest[col].mean() if pd.api.types.is_numeric_dtype(rest[col]) else "Mixed" for col in df.columns}
+        other[label] = f"Other ({len(rest)}, avg)"
+        other["color"] = OTHER_COLOR
+        return pd.concat([top, pd.DataFrame([other])], ignore_index=True)
+
+    def _downsample_trend(self, df: pd.DataFrame, metric: str) -> pd.DataFrame:
+        if len(df) <= LARGE_RESULT_ROWS:
+            return df
+        buckets = np.arange(len(df)) * MAX_TREND_POINTS // len(df)
+        aggregations = {"year": "last", metric: "mean"}
+        if "name" in df.columns:
+            aggregations["name"] = "first"
+        return df.groupby(buckets).agg(aggregations).reset_index(drop=True)
+
+    def _bin_locations(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Count suppliers per lat/lon grid cell, plotted at each cell's centroid
+        bins = {}
+        for axis in ("latitude", "longitude"):
+            low, high = df[axis].min(), df[axis].max()
+            step = max((high - low) / GEO_BINS_PER_AXIS, 1e-9)
+            bins[axis[:3] + "_bin"] = np.minimum(np.floor((df[axis] - low) / step), GEO_BINS_PER_AXIS - 1)
+        df = df.assign(**bins)
+        return df.groupby(["lat_bin", "lon_bin"], as_index=False).agg(
+            latitude=("latitude", "mean"),
+            longitude=("longitude", "mean"),
+            location=("location", "first"),
+            suppliers=("name", "count")
+        )
+
+    def _add_weather_annotations(self, fig: Any, df: pd.DataFrame, value: str, large: bool) -> None:
+        conditions = pd.Series(self._fetch_external_data().weather_summary(), dtype="object")
+        rain = df["supplier"].map(conditions).fillna("").str.contains("rain", case=False, regex=False)
+        rainy = df.loc[rain, ["name", value]]
+        for name, y in (rainy.head(MAX_ANNOTATIONS) if large else rainy).itertuples(index=False):
+            fig.add_annotation(
+                x=name,
+                y=y,
+                text="Weather Risk (Rain)",
+                showarrow=True,
+                arrowhead=1,
+                yshift=10,
+                font=dict(color=WORLDLY_COLORS["high_risk"])
+            )
+
+    def cleanup_charts(self, max_age: float = CHART_MAX_AGE) -> int:
+        # Charts not re-rendered within max_age can no longer be referenced by a cached response
+        cutoff = time.time() - max_age
+        removed = 0
+        # Temp files are only left behind if a render died mid-write
+        for path in glob.glob("static/worldly_*_viz_*.html") + glob.glob("static/worldly_*.tmp"):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
     def generate_visualization(self, results: List[Dict[str, Any]], question: str) -> str:
         if not results:
             return None
         df = pd.DataFrame(results)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        worldly_colors = {
-            "high_risk": "#D32F2F",
-            "moderate_risk": "#FF9800",
-            "low_risk": "#4CAF50",
-            "shahjalal": "#0288D1",
-            "patagonia": "#4CAF50",
-            "marzotto": "#7B1FA2",
-            "arvind": "#F57C00",
-            "crystal": "#388E3C",
-            "esquel": "#D81B60",
-            "nishat": "#0288D1",
-            "vardhman": "#7B1FA2",
-            "below_threshold": "#D32F2F",
-            "above_threshold": "#4CAF50"
-        }
+        # Same data version and question always map to the same file, so re-renders overwrite it
+        chart_id = hashlib.sha1(f"{self.data_version}:{normalize_question(question)}".encode()).hexdigest()[:16]
+        registry = self.registry
+        large = len(df) > LARGE_RESULT_ROWS
 
         question = question.lower()
         if "carbon_footprint" in df.columns and "name" in df.columns and "year" not in df.columns:
-            external_data = self._fetch_external_data()
-            df["emissions_risk"] = df["name"].map(lambda x: external_data["sustainability"][x]["emissions_risk"])
-            df["color"] = df["emissions_risk"].map({
-                "High": worldly_colors["high_risk"],
-                "Moderate": worldly_colors["moderate_risk"],
-                "Low": worldly_colors["low_risk"]
-            })
+            df["emissions_risk"] = registry.column(df["name"], "emissions_risk")
+            df["color"] = df["emissions_risk"].map(RISK_LABEL_COLORS)
             risk_data = self.execute_query("SELECT name, carbon_footprint, water_usage, compliance_score FROM suppliers")
             risk_df = pd.DataFrame(risk_data)
-            risk_df["risk_score"] = risk_df.apply(lambda row: self._calculate_risk_score(row["carbon_footprint"], row["water_usage"], row["compliance_score"]), axis=1)
-            df = df.merge(risk_df[["name", "risk_score"]], on="name")
+            risk_df["risk_score"] = self._calculate_risk_score(risk_df["carbon_footprint"], risk_df["water_usage"], risk_df["compliance_score"])
+            df = self._aggregate_top_n(df.merge(risk_df[["name", "risk_score"]], on="name"), "name", "carbon_footprint")
             fig = px.bar(
                 df,
                 x="name",
@@ -483,18 +692,14 @@ class WorldlySustainabilityAgent:
                     showarrow=True,
                     arrowhead=1,
                     yshift=10,
-                    font=dict(color=worldly_colors["high_risk"])
+                    font=dict(color=WORLDLY_COLORS["high_risk"])
                 )
-            filename = f"static/worldly_carbon_viz_{timestamp}.html"
+            filename = f"static/worldly_carbon_viz_{chart_id}.html"
 
         elif "water_usage" in df.columns and "name" in df.columns and "year" not in df.columns:
-            external_data = self._fetch_external_data()
-            df["water_risk"] = df["name"].map(lambda x: external_data["sustainability"][x]["water_risk"])
-            df["color"] = df["water_risk"].map({
-                "High": worldly_colors["high_risk"],
-                "Moderate": worldly_colors["moderate_risk"],
-                "Low": worldly_colors["low_risk"]
-            })
+            df["water_risk"] = registry.column(df["name"], "water_risk")
+            df["color"] = df["water_risk"].map(RISK_LABEL_COLORS)
+            df = self._aggregate_top_n(df, "name", "water_usage")
             fig = px.bar(
                 df,
                 x="name",
@@ -516,21 +721,13 @@ class WorldlySustainabilityAgent:
                     showarrow=True,
                     arrowhead=1,
                     yshift=10,
-                    font=dict(color=worldly_colors["high_risk"])
+                    font=dict(color=WORLDLY_COLORS["high_risk"])
                 )
-            filename = f"static/worldly_water_usage_viz_{timestamp}.html"
+            filename = f"static/worldly_water_usage_viz_{chart_id}.html"
 
         elif "water_per_unit" in df.columns and "name" in df.columns and "year" not in df.columns:
-            df["color"] = df["supplier"].map({
-                "Shahjalal Textile Mills": worldly_colors["shahjalal"],
-                "Patagonia Suppliers": worldly_colors["patagonia"],
-                "Marzotto Group": worldly_colors["marzotto"],
-                "Arvind Limited": worldly_colors["arvind"],
-                "Crystal Group": worldly_colors["crystal"],
-                "Esquel Group": worldly_colors["esquel"],
-                "Nishat Mills": worldly_colors["nishat"],
-                "Vardhman Textiles": worldly_colors["vardhman"]
-            })
+            df["color"] = registry.column(df["supplier"], "color")
+            df = self._aggregate_top_n(df, "name", "water_per_unit")
             fig = px.bar(
                 df,
                 x="name",
@@ -543,33 +740,12 @@ class WorldlySustainabilityAgent:
             )
             industry_avg = 15.0
             fig.add_hline(y=industry_avg, line_dash="dash", line_color="gray", annotation_text="Industry Avg (15 m³)", annotation_position="top left")
-            external_data = self._fetch_external_data()
-            for _, row in df.iterrows():
-                supplier = row["supplier"]
-                weather = external_data["weather"][supplier]["condition"] if supplier in external_data["weather"] else None
-                if weather and "rain" in weather.lower():
-                    fig.add_annotation(
-                        x=row["name"],
-                        y=row["water_per_unit"],
-                        text="Weather Risk (Rain)",
-                        showarrow=True,
-                        arrowhead=1,
-                        yshift=10,
-                        font=dict(color=worldly_colors["high_risk"])
-                    )
-            filename = f"static/worldly_water_viz_{timestamp}.html"
+            self._add_weather_annotations(fig, df, "water_per_unit", large)
+            filename = f"static/worldly_water_viz_{chart_id}.html"
 
         elif "carbon_per_unit" in df.columns and "name" in df.columns and "year" not in df.columns:
-            df["color"] = df["supplier"].map({
-                "Shahjalal Textile Mills": worldly_colors["shahjalal"],
-                "Patagonia Suppliers": worldly_colors["patagonia"],
-                "Marzotto Group": worldly_colors["marzotto"],
-                "Arvind Limited": worldly_colors["arvind"],
-                "Crystal Group": worldly_colors["crystal"],
-                "Esquel Group": worldly_colors["esquel"],
-                "Nishat Mills": worldly_colors["nishat"],
-                "Vardhman Textiles": worldly_colors["vardhman"]
-            })
+            df["color"] = registry.column(df["supplier"], "color")
+            df = self._aggregate_top_n(df, "name", "carbon_per_unit", ascending="low carbon footprint" in question)
             fig = px.bar(
                 df,
                 x="name",
@@ -582,28 +758,14 @@ class WorldlySustainabilityAgent:
             )
             industry_avg = 0.5
             fig.add_hline(y=industry_avg, line_dash="dash", line_color="gray", annotation_text="Industry Avg (0.5 kg CO2e)", annotation_position="top left")
-            external_data = self._fetch_external_data()
-            for _, row in df.iterrows():
-                supplier = row["supplier"]
-                weather = external_data["weather"][supplier]["condition"] if supplier in external_data["weather"] else None
-                if weather and "rain" in weather.lower():
-                    fig.add_annotation(
-                        x=row["name"],
-                        y=row["carbon_per_unit"],
-                        text="Weather Risk (Rain)",
-                        showarrow=True,
-                        arrowhead=1,
-                        yshift=10,
-                        font=dict(color=worldly_colors["high_risk"])
-                    )
-            filename = f"static/worldly_carbon_per_unit_viz_{timestamp}.html"
+            self._add_weather_annotations(fig, df, "carbon_per_unit", large)
+            filename = f"static/worldly_carbon_per_unit_viz_{chart_id}.html"
 
         elif "compliance_score" in df.columns and "location" in df.columns and "year" not in df.columns:
-            df["status"] = df["compliance_score"].apply(lambda x: "Below Threshold" if x < 0.9 else "Above Threshold")
-            df["color"] = df["status"].map({
-                "Below Threshold": worldly_colors["below_threshold"],
-                "Above Threshold": worldly_colors["above_threshold"]
-            })
+            below = df["compliance_score"] < 0.9
+            df["status"] = np.where(below, "Below Threshold", "Above Threshold")
+            df["color"] = np.where(below, WORLDLY_COLORS["below_threshold"], WORLDLY_COLORS["above_threshold"])
+            df = self._aggregate_top_n(df, "name", "compliance_score", ascending=True)
             fig = px.bar(
                 df,
                 x="name",
@@ -617,7 +779,7 @@ class WorldlySustainabilityAgent:
             fig.add_hline(y=0.9, line_dash="dash", line_color="red", annotation_text="Compliance Threshold (0.9)", annotation_position="top right")
             industry_avg = 0.92
             fig.add_hline(y=industry_avg, line_dash="dash", line_color="gray", annotation_text="Industry Avg (0.92)", annotation_position="top left")
-            filename = f"static/worldly_compliance_viz_{timestamp}.html"
+            filename = f"static/worldly_compliance_viz_{chart_id}.html"
 
         elif "year" in df.columns and ("carbon_footprint" in df.columns or "water_usage" in df.columns or "compliance_score" in df.columns):
             supplier_name = df["name"].iloc[0] if "name" in df.columns else "Unknown"
@@ -636,6 +798,7 @@ class WorldlySustainabilityAgent:
                 industry_avg = 0.92
                 industry_avg_label = "Industry Avg (0.92)"
 
+            df = self._downsample_trend(df, metric)
             fig = px.line(
                 df,
                 x="year",
@@ -645,18 +808,45 @@ class WorldlySustainabilityAgent:
                 markers=True
             )
             fig.add_hline(y=industry_avg, line_dash="dash", line_color="gray", annotation_text=industry_avg_label, annotation_position="top left")
-            filename = f"static/worldly_trend_viz_{timestamp}.html"
+            scenario = self.simulate_supplier_scenario(supplier_name)
+            if scenario:
+                band = scenario["bands"][metric]
+                fig.add_trace(go.Scatter(x=scenario["years"], y=band["p95"], mode="lines", line=dict(width=0), hoverinfo="skip"))
+                fig.add_trace(go.Scatter(
+                    x=scenario["years"],
+                    y=band["p5"],
+                    mode="lines",
+                    line=dict(width=0),
+                    fill="tonexty",
+                    fillcolor="rgba(2, 136, 209, 0.2)",
+                    name="Scenario 90% band"
+                ))
+                fig.add_trace(go.Scatter(x=scenario["years"], y=band["p50"], mode="lines", line=dict(dash="dot", color="#0288D1"), name="Scenario median"))
+            filename = f"static/worldly_trend_viz_{chart_id}.html"
 
         elif "location" in df.columns and "name" in df.columns and "latitude" in df.columns and "longitude" in df.columns:
-            fig = px.scatter_geo(
-                df,
-                lat="latitude",
-                lon="longitude",
-                hover_name="name",
-                hover_data=["location"],
-                title=f"Suppliers by Location ({question}) - Worldly ESG Insights",
-                projection="natural earth"
-            )
+            if large:
+                df = self._bin_locations(df)
+                fig = px.scatter_geo(
+                    df,
+                    lat="latitude",
+                    lon="longitude",
+                    size="suppliers",
+                    hover_name="location",
+                    hover_data=["suppliers"],
+                    title=f"Supplier Density ({question}) - Worldly ESG Insights",
+                    projection="natural earth"
+                )
+            else:
+                fig = px.scatter_geo(
+                    df,
+                    lat="latitude",
+                    lon="longitude",
+                    hover_name="name",
+                    hover_data=["location"],
+                    title=f"Suppliers by Location ({question}) - Worldly ESG Insights",
+                    projection="natural earth"
+                )
             fig.update_geos(
                 showcountries=True,
                 countrycolor="Black",
@@ -665,7 +855,7 @@ class WorldlySustainabilityAgent:
                 showocean=True,
                 oceancolor="LightBlue"
             )
-            filename = f"static/worldly_location_viz_{timestamp}.html"
+            filename = f"static/worldly_location_viz_{chart_id}.html"
 
         else:
             return None
@@ -684,12 +874,24 @@ class WorldlySustainabilityAgent:
         )
         # Ensure the static directory exists
         os.makedirs("static", exist_ok=True)
-        fig.write_html(filename)
+        # Load plotly.js from the CDN (like Bootstrap in index.html) instead of inlining ~3.5 MB per chart
+        # Each writer renders into its own temp file, then renames it over the chart, so
+        # concurrent renders of the same chart never collide and a page never loads a partial file
+        with tempfile.NamedTemporaryFile(dir="static", prefix="worldly_", suffix=".tmp", delete=False) as tmp:
+            tmp_path = tmp.name
+        try:
+            fig.write_html(tmp_path, include_plotlyjs="cdn")
+            os.replace(tmp_path, filename)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
         return filename.split('/', 1)[-1]  # Return just the filename for Flask to serve
 
-    def run(self, question: str) -> Dict[str, Any]:
-        cache_key = f"worldly:{hash(question)}"
-        cached_result = self._get_cached_result(cache_key)
+    def run(self, question: str, refresh: bool = False, should_stop: Callable[[], bool] | None = None) -> Dict[str, Any]:
+        # Keyed on the data version so answers computed before an ingestion are never served
+        cache_key = f"worldly:{self.refresh_data_version()}:{normalize_question(question)}"
+        cached_result = None if refresh else self._get_cached_result(cache_key)
         if cached_result:
             return cached_result
 
@@ -699,7 +901,9 @@ class WorldlySustainabilityAgent:
                 return {"error": "Invalid SQL generated.", "query": sql_query}
 
             results = self.execute_query(sql_query)
-            external_data = self._fetch_external_data()
+            self._check_budget(should_stop)
+            external_data = self._fetch_external_data(should_stop)
+            self._check_budget(should_stop)
             if not results:
                 response = {
                     "message": "No data found.",
@@ -708,18 +912,19 @@ class WorldlySustainabilityAgent:
                     "insight": self.generate_insight(question, results, external_data),
                     "visualization": self.generate_visualization(results, question),
                     "external_data_summary": {
-                        "weather_conditions": {k: v["condition"] for k, v in external_data["weather"].items()},
-                        "emissions_risks": {k: v["emissions_risk"] for k, v in external_data["sustainability"].items()}
+                        "weather_conditions": external_data.weather_summary(),
+                        "emissions_risks": external_data.emissions_summary()
                     }
                 }
                 self._cache_result(cache_key, response)
                 return response
 
             insight = self.generate_insight(question, results, external_data)
+            self._check_budget(should_stop)
             viz_file = self.generate_visualization(results, question)
 
-            weather_summary = {k: v["condition"] for k, v in external_data["weather"].items()}
-            sust_summary = {k: v["emissions_risk"] for k, v in external_data["sustainability"].items()}
+            weather_summary = external_data.weather_summary()
+            sust_summary = external_data.emissions_summary()
 
             response = {
                 "query": sql_query,
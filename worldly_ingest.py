@@ -0,0 +1,227 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, IO, Iterator, List, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+
+DEFAULT_CHUNK_SIZE = 5000
+# Upper bound on rows held in memory at once, whatever chunk size a caller asks for
+MAX_CHUNK_SIZE = 50000
+MAX_REPORTED_ERRORS = 20
+MIN_YEAR, MAX_YEAR = 1900, 2100
+
+
+def _year(value: Any) -> str:
+    # Stored as TEXT, but trend and scenario code parses it with int()
+    year = int(value)
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"year {year} outside {MIN_YEAR}-{MAX_YEAR}")
+    return str(year)
+
+
+# Column types per ingestible table; values that fail conversion reject the row
+TABLE_COLUMNS: Dict[str, Dict[str, Callable[[Any], Any]]] = {
+    "suppliers": {
+        "id": int, "name": str, "location": str, "latitude": float, "longitude": float,
+        "carbon_footprint": float, "water_usage": float, "compliance_score": float
+    },
+    "products": {
+        "id": int, "name": str, "supplier_id": int, "production_date": str,
+        "carbon_per_unit": float, "water_per_unit": float, "material": str
+    },
+    "supplier_history": {
+        "supplier_id": int, "year": _year, "carbon_footprint": float, "water_usage": float, "compliance_score": float
+    }
+}
+
+CONFLICT_KEYS = {
+    "suppliers": ["id"],
+    "products": ["id"],
+    "supplier_history": ["supplier_id", "year"]
+}
+
+SUPPORTED_FORMATS = ["csv", "ndjson"]
+
+
+class IngestError(Exception):
+    # Raised when a load fails partway; report still counts the chunks already committed
+    def __init__(self, message: str, report: Dict[str, Any]):
+        super().__init__(message)
+        self.report = report
+
+
+REQUIRED_COLUMNS = {
+    "suppliers": ["id", "name"],
+    "products": ["id", "name"],
+    # Trends and scenarios need every metric for every year
+    "supplier_history": ["supplier_id", "year", "carbon_footprint", "water_usage", "compliance_score"]
+}
+
+
+def _upsert_sql(table: str) -> str:
+    columns = list(TABLE_COLUMNS[table])
+    keys = CONFLICT_KEYS[table]
+    # COALESCE keeps stored values for columns a feed leaves out
+    updates = ", ".join(f"{col} = COALESCE(excluded.{col}, {table}.{col})" for col in columns if col not in keys)
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + col for col in columns)}) "
+        f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}"
+    )
+
+
+def infer_format(filename: str = "", mimetype: str = "") -> str:
+    if filename.endswith((".ndjson", ".jsonl")) or mimetype in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return "csv"
+
+
+class _ReadableStream(io.RawIOBase):
+    # Werkzeug spools uploads into SpooledTemporaryFile, which has no readable() before
+    # Python 3.11, so TextIOWrapper cannot wrap it directly. Only read() is relied on here.
+    def __init__(self, stream: IO):
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def iter_records(stream: IO, fmt: str) -> Iterator[Dict[str, Any]]:
+    # utf-8-sig drops a leading BOM that would otherwise end up in the first CSV header
+    text_stream = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(
+        io.BufferedReader(_ReadableStream(stream)), encoding="utf-8-sig", newline=""
+    )
+    if fmt == "csv":
+        yield from csv.DictReader(text_stream)
+    elif fmt == "ndjson":
+        for line in text_stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Rejected by validate_record so one bad line does not abort the upload
+                yield None
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def validate_record(table: str, record: Dict[str, Any] | None) -> Dict[str, Any]:
+    if not isinstance(record, dict):
+        raise ValueError("malformed record")
+    row = {}
+    for col, convert in TABLE_COLUMNS[table].items():
+        value = record.get(col)
+        row[col] = None if value is None or value == "" else convert(value)
+    missing = [col for col in REQUIRED_COLUMNS[table] if row[col] is None]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    # Mirrors CHECK(compliance_score BETWEEN 0 AND 1) on suppliers
+    compliance = row.get("compliance_score")
+    if compliance is not None and not 0 <= compliance <= 1:
+        raise ValueError(f"compliance_score {compliance} outside 0-1")
+    return row
+
+
+def _bump_data_version(conn: Connection) -> int:
+    version = conn.execute(text("PRAGMA user_version")).scalar() + 1
+    conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+    return version
+
+
+def ingest_stream(engine: Engine, table: str, stream: IO, fmt: str = "csv", chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    chunk_size = min(chunk_size, MAX_CHUNK_SIZE)
+    sql = text(_upsert_sql(table))
+    records = enumerate(iter_records(stream, fmt), start=1)
+    written, rejected, chunks = 0, 0, 0
+    errors: List[str] = []
+    data_version = None
+    failure = None
+    started = time.perf_counter()
+
+    try:
+        # Only one chunk of parsed rows is held in memory at a time
+        while True:
+            batch: List[Tuple[int, Dict[str, Any]]] = list(islice(records, chunk_size))
+            if not batch:
+                break
+            rows = []
+            for record_number, record in batch:
+                try:
+                    rows.append(validate_record(table, record))
+                except (ValueError, TypeError) as e:
+                    rejected += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append(f"record {record_number}: {e}")
+            if rows:
+                with engine.begin() as conn:
+                    conn.execute(sql, rows)
+                written += len(rows)
+            chunks += 1
+    except Exception as e:
+        failure = e
+    finally:
+        # Committed chunks stay in the DB, so caches must see them even if a later chunk failed
+        if written:
+            with engine.begin() as conn:
+                data_version = _bump_data_version(conn)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        "table": table,
+        "rows_written": written,
+        "rows_rejected": rejected,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(written / elapsed, 1) if elapsed > 0 else None,
+        "data_version": data_version,
+        "errors": errors
+    }
+    if failure is not None:
+        raise IngestError(f"Ingestion failed after {written} committed rows: {failure}", report) from failure
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream CSV/NDJSON supplier feeds into the Worldly database.")
+    parser.add_argument("table", choices=sorted(TABLE_COLUMNS))
+    parser.add_argument("path", help="CSV or NDJSON file, or - for stdin")
+    parser.add_argument("--db", default="/tmp/worldly_risk.db")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    fmt = args.format or infer_format(args.path)
+    try:
+        if args.path == "-":
+            report = ingest_stream(engine, args.table, sys.stdin.buffer, fmt, args.chunk_size)
+        else:
+            with open(args.path, "rb") as f:
+                report = ingest_stream(engine, args.table, f, fmt, args.chunk_size)
+    except IngestError as e:
+        print(json.dumps({"error": str(e), **e.report}, indent=2))
+        sys.exit(1)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
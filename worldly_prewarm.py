@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from worldly_agent import WorldlySustainabilityAgent, normalize_question
+from worldly_scenarios import worker_cpu_seconds
+
+logger = logging.getLogger(__name__)
+
+PREWARM_TOP_K = 20
+PREWARM_INTERVAL = 900  # seconds; below the 3600s response TTL so popular answers never expire
+PREWARM_POLL = 30  # seconds between data version checks
+PREWARM_TIME_BUDGET = 60.0  # wall-clock seconds per warm cycle
+PREWARM_CPU_BUDGET = 30.0  # CPU seconds per cycle: warming thread plus scenario pool workers
+MAX_TRACKED_QUESTIONS = 1000
+
+# Seeded once so a cold start warms the questions users ask most, before any traffic is counted
+POPULAR_QUESTIONS = [
+    "Which suppliers have the highest carbon footprint?",
+    "Which suppliers in China have the highest carbon footprint?",
+    "Which suppliers in India have the highest carbon footprint?",
+    "How does weather affect water-intensive products?",
+    "Which products exceed compliance thresholds?",
+    "Which suppliers in Pakistan have compliance scores below 0.9?",
+    "Show the historical carbon footprint trend for Crystal Group"
+]
+
+
+class PrewarmScheduler:
+    def __init__(
+        self,
+        agent: WorldlySustainabilityAgent,
+        top_k: int = PREWARM_TOP_K,
+        interval: float = PREWARM_INTERVAL,
+        time_budget: float = PREWARM_TIME_BUDGET,
+        cpu_budget: float = PREWARM_CPU_BUDGET
+    ):
+        self.agent = agent
+        self.top_k = top_k
+        self.interval = interval
+        self.time_budget = time_budget
+        self.cpu_budget = cpu_budget
+        self.counts = Counter({normalize_question(q): 1 for q in POPULAR_QUESTIONS})
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, question: str) -> None:
+        with self._lock:
+            self.counts[normalize_question(question)] += 1
+            if len(self.counts) > 2 * MAX_TRACKED_QUESTIONS:
+                self.counts = Counter(dict(self.counts.most_common(MAX_TRACKED_QUESTIONS)))
+
+    def top_questions(self) -> List[str]:
+        with self._lock:
+            return [question for question, _ in self.counts.most_common(self.top_k)]
+
+    def trigger(self) -> None:
+        # Called after a data refresh to warm without waiting for the next poll
+        self._wake.set()
+
+    def _cpu_seconds(self) -> float:
+        children = os.times()
+        return time.thread_time() + worker_cpu_seconds() + children.children_user + children.children_system
+
+    def warm(self) -> Dict[str, Any]:
+        started_wall = time.monotonic()
+        started_cpu = self._cpu_seconds()
+
+        def over_budget() -> bool:
+            return time.monotonic() - started_wall > self.time_budget or self._cpu_seconds() - started_cpu > self.cpu_budget
+
+        warmed = []
+        for question in self.top_questions():
+            if over_budget():
+                break
+            # Also checked between the SQL, weather, insight and chart steps of each answer
+            response = self.agent.run(question, refresh=True, should_stop=over_budget)
+            if "error" not in response:
+                warmed.append(question)
+        return {
+            "warmed": len(warmed),
+            "seconds": round(time.monotonic() - started_wall, 3),
+            "cpu_seconds": round(self._cpu_seconds() - started_cpu, 3)
+        }
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="worldly-prewarm", daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        warmed_version = None
+        last_warm = 0.0
+        triggered = True  # warm once right after startup
+        while True:
+            try:
+                data_version = self.agent.refresh_data_version()
+                if triggered or data_version != warmed_version or time.monotonic() - last_warm >= self.interval:
+                    report = self.warm()
+                    removed = self.agent.cleanup_charts()
+                    logger.info("Pre-warmed %d questions in %.1fs (%.1fs CPU), removed %d stale charts", report["warmed"], report["seconds"], report["cpu_seconds"], removed)
+                    warmed_version = data_version
+                    last_warm = time.monotonic()
+            except Exception:
+                logger.exception("Pre-warm cycle failed")
+            triggered = self._wake.wait(PREWARM_POLL)
+            self._wake.clear()
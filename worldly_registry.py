@@ -0,0 +1,89 @@
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Risk bands derived from each supplier's carbon (tons CO2e) and water (m³) columns
+EMISSIONS_RISK_THRESHOLDS = [(1200.0, "High"), (950.0, "Moderate"), (0.0, "Low")]
+WATER_RISK_THRESHOLDS = [(15000.0, "High"), (12500.0, "Moderate"), (0.0, "Low")]
+
+# Supplier colors, cycled by id
+SUPPLIER_PALETTE = ["#0288D1", "#7B1FA2", "#4CAF50", "#F57C00", "#388E3C", "#D81B60", "#5D4037", "#00838F"]
+
+DEFAULT_RISK_LABEL = "Unknown"
+WEATHER_TTL = 600  # seconds
+
+
+def _risk_label(value: float | None, thresholds: List[Tuple[float, str]]) -> str:
+    if value is None:
+        return DEFAULT_RISK_LABEL
+    for threshold, label in thresholds:
+        if value >= threshold:
+            return label
+    return DEFAULT_RISK_LABEL
+
+
+class SupplierRecord:
+    __slots__ = (
+        "id", "name", "location", "latitude", "longitude",
+        "emissions_risk", "water_risk", "color", "weather", "weather_fetched_at"
+    )
+
+    def __init__(
+        self,
+        supplier_id: int,
+        name: str,
+        location: str,
+        latitude: float,
+        longitude: float,
+        carbon_footprint: float | None,
+        water_usage: float | None
+    ):
+        self.id = supplier_id
+        self.name = name
+        self.location = location
+        self.latitude = latitude
+        self.longitude = longitude
+        self.emissions_risk = _risk_label(carbon_footprint, EMISSIONS_RISK_THRESHOLDS)
+        self.water_risk = _risk_label(water_usage, WATER_RISK_THRESHOLDS)
+        self.color = SUPPLIER_PALETTE[(supplier_id - 1) % len(SUPPLIER_PALETTE)]
+        self.weather = None
+        self.weather_fetched_at = 0.0
+
+
+class SupplierRegistry:
+    def __init__(self, rows: Iterable[Tuple[int, str, str, float, float, float, float]], version: int):
+        self.version = version
+        self.records: Dict[int, SupplierRecord] = {}
+        self.ids: Dict[str, int] = {}
+        for supplier_id, name, location, latitude, longitude, carbon_footprint, water_usage in rows:
+            name = sys.intern(name)
+            self.records[supplier_id] = SupplierRecord(supplier_id, name, location, latitude, longitude, carbon_footprint, water_usage)
+            self.ids[name] = supplier_id
+        self.names: List[str] = list(self.ids)
+
+    def get(self, name: str) -> SupplierRecord | None:
+        supplier_id = self.ids.get(name)
+        return self.records[supplier_id] if supplier_id is not None else None
+
+    def column(self, names: Iterable[str], attr: str) -> List[Any]:
+        records, ids = self.records, self.ids
+        return [getattr(records[ids[name]], attr) if name in ids else None for name in names]
+
+    def refresh_weather(self, fetch: Callable[[float, float], Dict[str, Any]], should_stop: Callable[[], bool] | None = None) -> None:
+        now = time.monotonic()
+        for record in self.records.values():
+            if should_stop is not None and should_stop():
+                break
+            if record.weather is None or now - record.weather_fetched_at > WEATHER_TTL:
+                record.weather = fetch(record.latitude, record.longitude)
+                record.weather_fetched_at = now
+
+    def weather_condition(self, name: str) -> str | None:
+        record = self.get(name)
+        return record.weather.get("condition") if record and record.weather else None
+
+    def weather_summary(self) -> Dict[str, str | None]:
+        return {record.name: record.weather.get("condition") if record.weather else None for record in self.records.values()}
+
+    def emissions_summary(self) -> Dict[str, str]:
+        return {record.name: record.emissions_risk for record in self.records.values()}
@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCENARIO_METRICS = ["carbon_footprint", "water_usage", "compliance_score"]
+SCENARIO_PERCENTILES = [5, 25, 50, 75, 95]
+# Below this many suppliers per worker the process pool costs more than it saves
+SUPPLIERS_PER_SHARD = 64
+
+RiskFn = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+# One pool per process for batch runs, created on first use and reused afterwards
+_pool = None
+_pool_lock = threading.Lock()
+# CPU seconds spent in pool workers, which thread and process timers in the parent never see
+_worker_cpu_seconds = 0.0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _pool
+
+
+def worker_cpu_seconds() -> float:
+    return _worker_cpu_seconds
+
+
+def _fit_random_walk(years: np.ndarray, values: np.ndarray) -> Tuple[float, float]:
+    if len(values) < 2 or years[-1] == years[0]:
+        return 0.0, abs(values[-1]) * 0.01
+    # Same endpoint drift as _predict_future, volatility from the year-over-year changes
+    drift = (values[-1] - values[0]) / (years[-1] - years[0])
+    steps = np.diff(values) / np.maximum(np.diff(years), 1.0)
+    sigma = float(np.std(steps - drift, ddof=1)) if len(steps) > 1 else 0.0
+    # Perfectly linear histories would otherwise collapse the band to a single line
+    return float(drift), max(sigma, abs(values[-1]) * 0.01)
+
+
+def _percentile_bands(paths: np.ndarray) -> Dict[str, List[float]]:
+    bands = np.percentile(paths, SCENARIO_PERCENTILES, axis=0)
+    return {f"p{p}": band.round(4).tolist() for p, band in zip(SCENARIO_PERCENTILES, bands)}
+
+
+def simulate_supplier(history: Dict[str, Any], risk_fn: RiskFn, horizon: int, n_paths: int, seed: int) -> Dict[str, Any]:
+    years = np.array([int(y) for y in history["year"]], dtype=float)
+    if any(not np.all(np.isfinite(np.asarray(history[metric], dtype=float))) for metric in SCENARIO_METRICS):
+        raise ValueError(f"missing metric values in history for supplier {history['supplier_id']}")
+    # Seeding per supplier keeps results identical however the portfolio is sharded
+    rng = np.random.default_rng([seed, int(history["supplier_id"])])
+
+    paths = {}
+    for metric in SCENARIO_METRICS:
+        values = np.asarray(history[metric], dtype=float)
+        drift, sigma = _fit_random_walk(years, values)
+        path = values[-1] + np.cumsum(rng.normal(drift, sigma, size=(n_paths, horizon)), axis=1)
+        paths[metric] = np.clip(path, 0.0, 1.0) if metric == "compliance_score" else np.maximum(path, 0.0)
+
+    bands = {metric: _percentile_bands(paths[metric]) for metric in SCENARIO_METRICS}
+    bands["risk_score"] = _percentile_bands(risk_fn(paths["carbon_footprint"], paths["water_usage"], paths["compliance_score"]))
+    return {
+        "supplier_id": history["supplier_id"],
+        "name": history["name"],
+        "years": [str(int(years[-1]) + step) for step in range(1, horizon + 1)],
+        "n_paths": n_paths,
+        "bands": bands
+    }
+
+
+def _simulate_shard(shard: List[Dict[str, Any]], risk_fn: RiskFn, horizon: int, n_paths: int, seed: int) -> List[Dict[str, Any]]:
+    results = []
+    for history in shard:
+        # One malformed history (bad year, missing metrics) must not sink the whole portfolio
+        try:
+            results.append(simulate_supplier(history, risk_fn, horizon, n_paths, seed))
+        except (ValueError, TypeError) as e:
+            logger.warning("Skipping scenario for supplier %s: %s", history.get("supplier_id"), e)
+    return results
+
+
+def _simulate_shard_timed(shard: List[Dict[str, Any]], risk_fn: RiskFn, horizon: int, n_paths: int, seed: int) -> Tuple[List[Dict[str, Any]], float]:
+    started = time.process_time()
+    results = _simulate_shard(shard, risk_fn, horizon, n_paths, seed)
+    return results, time.process_time() - started
+
+
+def simulate_portfolio(
+    histories: List[Dict[str, Any]],
+    risk_fn: RiskFn,
+    horizon: int = 5,
+    n_paths: int = 1000,
+    seed: int = 42,
+    workers: int | None = None
+) -> Dict[str, Dict[str, Any]]:
+    histories = [history for history in histories if history["year"]]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(histories) // SUPPLIERS_PER_SHARD))
+
+    if workers <= 1:
+        results = _simulate_shard(histories, risk_fn, horizon, n_paths, seed)
+    else:
+        shards = [histories[i::workers] for i in range(workers)]
+        pool = _get_pool()
+        global _worker_cpu_seconds
+        futures = [pool.submit(_simulate_shard_timed, shard, risk_fn, horizon, n_paths, seed) for shard in shards]
+        results = []
+        for future in futures:
+            shard_results, cpu_seconds = future.result()
+            results.extend(shard_results)
+            with _pool_lock:
+                _worker_cpu_seconds += cpu_seconds
+    return {scenario["name"]: scenario for scenario in results}